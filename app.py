@@ -6,33 +6,98 @@ specifications, environmental conditions, and cost factors.
 
 import streamlit as st
 import pandas as pd
-import numpy as np
-import plotly.express as px
 from streamlit_option_menu import option_menu
 import os
 import json
+import functools
 
 # Import local modules
 from material_data import (
     generate_material_database,
     generate_supplier_database,
+    downcast_columns,
+    MATERIAL_FLOAT_COLUMNS,
     MATERIAL_TYPES,
     APPLICATIONS,
 )
-from data_utils import calculate_material_scores, filter_materials_by_application
+from data_utils import load_or_build
 from model import MaterialRecommender
-from visualization import (
-    visualize_material_comparison,
-    visualize_cost_analysis,
-    visualize_durability_vs_cost,
-    visualize_environmental_impact,
-    visualize_weather_resistance,
-    visualize_material_scores,
-    visualize_supplier_comparison,
-)
 from auth import display_login_page, logout_user
 from projects import display_user_projects, display_save_project_form
 from init_db import init_database
+from db_utils import CATALOG_CACHE_TTL
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+STATIC_DIR = os.path.join(APP_DIR, "static")
+
+# On-disk cache for the generated material and supplier databases. It and the
+# in-process loaders below expire on the same schedule as the database reads
+# in db_utils; each of the three layers can add up to one CATALOG_CACHE_TTL
+# before a catalog change shows up
+CACHE_DIR = os.path.join(APP_DIR, "cache")
+CACHE_MAX_AGE = CATALOG_CACHE_TTL
+
+
+@st.cache_resource(ttl=CACHE_MAX_AGE, show_spinner=False)
+def load_materials():
+    """Load the materials database, using the Parquet cache when available."""
+    materials_df = load_or_build(
+        os.path.join(CACHE_DIR, "materials.parquet"),
+        generate_material_database,
+        max_age=CACHE_MAX_AGE,
+    )
+    materials_df = downcast_columns(materials_df, float_columns=MATERIAL_FLOAT_COLUMNS)
+    return materials_df.set_index("id", drop=False)
+
+
+@st.cache_resource(ttl=CACHE_MAX_AGE, show_spinner=False)
+def load_suppliers():
+    """Load the suppliers database, using the Parquet cache when available."""
+    suppliers_df = load_or_build(
+        os.path.join(CACHE_DIR, "suppliers.parquet"),
+        generate_supplier_database,
+        max_age=CACHE_MAX_AGE,
+    )
+    return suppliers_df.set_index("supplier_id", drop=False)
+
+
+@st.cache_resource(ttl=CACHE_MAX_AGE, show_spinner=False)
+def load_material_suppliers():
+    """Join every material with its supplier's details, once per process."""
+    suppliers_df = load_suppliers().reset_index(drop=True)
+    suppliers_df = suppliers_df.rename(
+        columns=lambda c: c if c == "supplier_id" else f"supplier_{c}"
+    )
+    material_suppliers = load_materials().merge(
+        suppliers_df, on="supplier_id", how="left"
+    )
+    return material_suppliers.set_index("id", drop=False)
+
+
+@st.cache_resource(ttl=CACHE_MAX_AGE, show_spinner=False)
+def load_recommender():
+    """Build the recommender once per process on the shared materials database."""
+    return MaterialRecommender(load_materials())
+
+
+# Sidebar navigation entries and their positions
+MENU_OPTIONS = [
+    "Project Specifications",
+    "Recommendations",
+    "Material Comparison",
+    "Cost Analysis",
+    "My Projects",
+    "Help",
+]
+MENU_INDEX = {option: i for i, option in enumerate(MENU_OPTIONS)}
+
+
+@functools.lru_cache(maxsize=1)
+def load_css():
+    """Read the app stylesheet once per process."""
+    with open(os.path.join(STATIC_DIR, "app.css")) as f:
+        return f.read()
+
 
 # Set page configuration
 st.set_page_config(
@@ -42,66 +107,20 @@ st.set_page_config(
 )
 
 # Custom CSS for better appearance
-st.markdown(
-    """
-<style>
-    .block-container {
-        padding-top: 2rem;
-        padding-bottom: 2rem;
-    }
-    .main-header {
-        font-size: 2.5rem;
-        font-weight: bold;
-        color: #2c3e50;
-        margin-bottom: 1rem;
-    }
-    .sub-header {
-        font-size: 1.5rem;
-        color: #34495e;
-        margin-bottom: 2rem;
-    }
-    .stTabs [data-baseweb="tab-list"] {
-        gap: 24px;
-    }
-    .stTabs [data-baseweb="tab"] {
-        height: 50px;
-        white-space: pre-wrap;
-        background-color: #f8f9fa;
-        border-radius: 4px 4px 0px 0px;
-        gap: 1px;
-        padding-top: 10px;
-        padding-bottom: 10px;
-    }
-    .stTabs [aria-selected="true"] {
-        background-color: #4e8df5;
-        color: white;
-    }
-    div[data-testid="stSidebarContent"] > div:nth-child(1) {
-        padding-top: 2rem;
-    }
-    .css-1544g2n {
-        padding-top: 2rem;
-    }
-</style>
-""",
-    unsafe_allow_html=True,
-)
+st.markdown(f"<style>{load_css()}</style>", unsafe_allow_html=True)
 
 # Initialize database if needed
 if "db_initialized" not in st.session_state:
     init_database()
     st.session_state["db_initialized"] = True
 
-# Initialize session state
-if "materials_df" not in st.session_state:
-    st.session_state.materials_df = generate_material_database()
-
-if "suppliers_df" not in st.session_state:
-    st.session_state.suppliers_df = generate_supplier_database()
-
-if "recommender" not in st.session_state:
-    st.session_state.recommender = MaterialRecommender()
+# Shared read-only databases and model, one copy per server process
+st.session_state.materials_df = load_materials()
+st.session_state.suppliers_df = load_suppliers()
+st.session_state.material_suppliers = load_material_suppliers()
+st.session_state.recommender = load_recommender()
 
+# Initialize session state
 if "project_specs" not in st.session_state:
     st.session_state.project_specs = {
         "applications": [],
@@ -120,12 +139,16 @@ if "project_specs" not in st.session_state:
 if "recommended_materials" not in st.session_state:
     st.session_state.recommended_materials = None
 
+# Insertion-ordered dict used as an ordered set of material IDs
 if "selected_materials" not in st.session_state:
-    st.session_state.selected_materials = []
+    st.session_state.selected_materials = {}
 
 if "project_area" not in st.session_state:
     st.session_state.project_area = 100.0
 
+if "selected_menu" not in st.session_state:
+    st.session_state.selected_menu = 0
+
 
 def update_project_specs():
     """Update project specifications based on user input."""
@@ -149,12 +172,27 @@ def update_project_specs():
         },
     }
 
+    # Encode the specifications once, for the change check below and for
+    # saving the project
+    st.session_state.specs_json = json.dumps(
+        st.session_state.project_specs, sort_keys=True, default=str
+    )
+
 
 def get_recommendations():
     """Get material recommendations based on project specifications."""
     # Update project specs
     update_project_specs()
 
+    # Skip scoring when the specifications have not changed since last time
+    specs_hash = hash(st.session_state.specs_json)
+    if (
+        st.session_state.recommended_materials is not None
+        and st.session_state.get("specs_hash") == specs_hash
+    ):
+        return
+    st.session_state.specs_hash = specs_hash
+
     # Get recommendations
     recommended_materials = st.session_state.recommender.recommend_materials(
         st.session_state.project_specs, n_recommendations=10
@@ -166,19 +204,38 @@ def get_recommendations():
 
 def add_to_comparison(material_id):
     """Add a material to the comparison list."""
-    if material_id not in st.session_state.selected_materials:
-        st.session_state.selected_materials.append(material_id)
+    st.session_state.selected_materials.setdefault(material_id, None)
 
 
 def remove_from_comparison(material_id):
     """Remove a material from the comparison list."""
-    if material_id in st.session_state.selected_materials:
-        st.session_state.selected_materials.remove(material_id)
+    st.session_state.selected_materials.pop(material_id, None)
+
+
+def update_comparison(material_ids):
+    """Sync the comparison list with the recommendations picker."""
+    picked = st.session_state.comparison_picker
+    for material_id in material_ids:
+        if material_id in picked:
+            add_to_comparison(material_id)
+        else:
+            remove_from_comparison(material_id)
 
 
 def clear_comparison():
     """Clear the comparison list."""
-    st.session_state.selected_materials = []
+    st.session_state.selected_materials = {}
+
+
+def display_chart(fig):
+    """Render a Plotly figure without the mode bar or Streamlit theming."""
+    if fig:
+        st.plotly_chart(
+            fig,
+            use_container_width=True,
+            theme=None,
+            config={"displayModeBar": False, "responsive": True},
+        )
 
 
 def display_project_specifications():
@@ -358,58 +415,75 @@ def display_project_specifications():
 
 def display_recommendations():
     """Display the recommendations."""
+    from visualization import visualize_material_scores, visualize_durability_vs_cost
+
     st.header("Material Recommendations")
     st.info("Top materials for your project based on your specifications")
 
     if st.session_state.recommended_materials is not None:
         # Display the recommendation scores visualization
         score_fig = visualize_material_scores(st.session_state.recommended_materials)
-        if score_fig:
-            st.plotly_chart(score_fig, use_container_width=True)
+        display_chart(score_fig)
 
         # Display the recommended materials in a table
         st.subheader("Top Recommended Materials")
 
         # Create a table with the top 5 materials
-        for i, (_, material) in enumerate(
-            st.session_state.recommended_materials.head(5).iterrows()
-        ):
-            col1, col2, col3 = st.columns([3, 1, 1])
-
-            with col1:
-                st.write(f"**{i+1}. {material['name']}** ({material['type']})")
-                st.write(f"Applications: {', '.join(material['applications'])}")
-                st.write(f"Score: {material['total_score']:.2f}/10")
-
-            with col2:
-                st.write(f"Strength: {material['strength_mpa']} MPa")
-                st.write(f"Durability: {material['durability_years']} years")
-                st.write(f"Cost: ${material['cost_per_unit']:.2f} per unit")
-
-            with col3:
-                if material["id"] in st.session_state.selected_materials:
-                    st.button(
-                        "⛔ Remove",
-                        key=f"remove_{material['id']}",
-                        on_click=remove_from_comparison,
-                        args=(material["id"],),
-                    )
-                else:
-                    st.button(
-                        "➕ Compare",
-                        key=f"add_{material['id']}",
-                        on_click=add_to_comparison,
-                        args=(material["id"],),
-                    )
-
-            st.divider()
+        top_materials = st.session_state.recommended_materials.head(5)
+        top_table = top_materials[
+            [
+                "name",
+                "type",
+                "applications_str",
+                "total_score",
+                "strength_mpa",
+                "durability_years",
+                "cost_per_unit",
+            ]
+        ]
+
+        st.dataframe(
+            top_table,
+            hide_index=True,
+            use_container_width=True,
+            column_config={
+                "name": "Material",
+                "type": "Type",
+                "applications_str": "Applications",
+                "total_score": st.column_config.NumberColumn(
+                    "Score (0-10)", format="%.2f"
+                ),
+                "strength_mpa": st.column_config.NumberColumn("Strength (MPa)"),
+                "durability_years": st.column_config.NumberColumn(
+                    "Durability (years)"
+                ),
+                "cost_per_unit": st.column_config.NumberColumn(
+                    "Cost per Unit", format="$%.2f"
+                ),
+            },
+        )
+
+        # Pick which of the top materials to compare
+        top_ids = top_materials["id"].tolist()
+        top_names = dict(zip(top_ids, top_materials["name"]))
+        st.multiselect(
+            "Materials to Compare",
+            options=top_ids,
+            default=[i for i in top_ids if i in st.session_state.selected_materials],
+            format_func=top_names.get,
+            key="comparison_picker",
+            on_change=update_comparison,
+            args=(top_ids,),
+        )
+
+        st.divider()
 
         # Display durability vs cost chart for all materials
         st.subheader("Durability vs. Cost Analysis")
         durability_cost_fig = visualize_durability_vs_cost(
             st.session_state.materials_df
         )
-        st.plotly_chart(durability_cost_fig, use_container_width=True)
+        display_chart(durability_cost_fig)
     else:
         st.info(
             "Enter your project specifications and click 'Get Material Recommendations' to see recommendations."
@@ -418,6 +492,13 @@ def display_recommendations():
 
 def display_comparison():
     """Display the material comparison."""
+    from visualization import (
+        visualize_material_comparison,
+        visualize_environmental_impact,
+        visualize_weather_resistance,
+        visualize_supplier_comparison,
+    )
+
     st.header("Material Comparison")
     st.info("Compare different materials side by side")
 
@@ -432,9 +513,7 @@ def display_comparison():
         for i, material_id in enumerate(st.session_state.selected_materials):
             col_index = i % len(cols)
             with cols[col_index]:
-                material = st.session_state.materials_df[
-                    st.session_state.materials_df["id"] == material_id
-                ].iloc[0]
+                material = st.session_state.materials_df.loc[material_id]
                 st.write(f"**{material['name']}**")
                 st.button(
                     "Remove",
@@ -446,66 +525,83 @@ def display_comparison():
         # Add a button to clear all comparisons
         st.button("Clear All Comparisons", on_click=clear_comparison, type="secondary")
 
+        # Cached figures are keyed on the selection regardless of the order
+        # in which materials were added
+        selected_ids = tuple(sorted(st.session_state.selected_materials))
+
         # Display radar chart comparison
         st.subheader("Property Comparison")
         radar_fig = visualize_material_comparison(
-            st.session_state.materials_df, st.session_state.selected_materials
+            st.session_state.materials_df, selected_ids
         )
-        if radar_fig:
-            st.plotly_chart(radar_fig, use_container_width=True)
+        display_chart(radar_fig)
 
         # Display environmental impact comparison
         st.subheader("Environmental Impact Comparison")
         eco_fig = visualize_environmental_impact(
-            st.session_state.materials_df, st.session_state.selected_materials
+            st.session_state.materials_df, selected_ids
         )
-        if eco_fig:
-            st.plotly_chart(eco_fig, use_container_width=True)
+        display_chart(eco_fig)
 
         # Display weather resistance comparison
         st.subheader("Weather Resistance Comparison")
         weather_fig = visualize_weather_resistance(
-            st.session_state.materials_df, st.session_state.selected_materials
+            st.session_state.materials_df, selected_ids
         )
-        if weather_fig:
-            st.plotly_chart(weather_fig, use_container_width=True)
+        display_chart(weather_fig)
 
         # Display supplier information
         st.subheader("Supplier Information")
 
         # Get suppliers for selected materials
-        supplier_ids = []
-        for material_id in st.session_state.selected_materials:
-            material = st.session_state.materials_df[
-                st.session_state.materials_df["id"] == material_id
-            ].iloc[0]
-            supplier_id = material["supplier_id"]
-            if supplier_id not in supplier_ids:
-                supplier_ids.append(supplier_id)
+        selected_suppliers = st.session_state.material_suppliers.loc[
+            list(st.session_state.selected_materials)
+        ].drop_duplicates("supplier_id")
+        supplier_ids = tuple(sorted(selected_suppliers["supplier_id"]))
 
         # Display supplier comparison
         supplier_fig = visualize_supplier_comparison(
             st.session_state.suppliers_df, supplier_ids
         )
-        if supplier_fig:
-            st.plotly_chart(supplier_fig, use_container_width=True)
+        display_chart(supplier_fig)
 
         # Display supplier details
-        for supplier_id in supplier_ids:
-            supplier = st.session_state.suppliers_df[
-                st.session_state.suppliers_df["supplier_id"] == supplier_id
-            ].iloc[0]
-            st.write(f"**{supplier['name']}** ({supplier['supplier_id']})")
-            st.write(f"Location: {supplier['location']}")
-            st.write(f"Price Level: {supplier['price_level']}")
-            st.write(f"Delivery Time: {supplier['delivery_time_days']} days")
-            st.write(f"Reliability Score: {supplier['reliability_score']}/10")
-            st.write(f"Contact: {supplier['contact']}")
-            st.divider()
+        supplier_details = (
+            selected_suppliers.set_index("supplier_id")[
+                [
+                    "supplier_name",
+                    "supplier_location",
+                    "supplier_price_level",
+                    "supplier_delivery_time_days",
+                    "supplier_reliability_score",
+                    "supplier_contact",
+                ]
+            ]
+            .rename_axis("Supplier ID")
+            .rename(
+                columns={
+                    "supplier_name": "Name",
+                    "supplier_location": "Location",
+                    "supplier_price_level": "Price Level",
+                    "supplier_delivery_time_days": "Delivery Time (days)",
+                    "supplier_reliability_score": "Reliability Score (1-10)",
+                    "supplier_contact": "Contact",
+                }
+            )
+        )
+        st.table(supplier_details)
 
 
+@st.fragment
 def display_cost_analysis():
-    """Display the cost analysis."""
+    """
+    Display the cost analysis.
+
+    Runs as a fragment so changing the project size only reruns this view
+    instead of the whole app.
+    """
+    from visualization import visualize_cost_analysis
+
     st.header("Cost Analysis")
     st.info("Analyze the cost implications of different materials")
 
@@ -529,34 +625,37 @@ def display_cost_analysis():
         st.subheader("Material Cost Comparison")
         cost_fig = visualize_cost_analysis(
             st.session_state.materials_df,
-            st.session_state.selected_materials,
+            tuple(sorted(st.session_state.selected_materials)),
             st.session_state.project_area,
         )
-        if cost_fig:
-            st.plotly_chart(cost_fig, use_container_width=True)
+        display_chart(cost_fig)
 
         # Display cost table
         st.subheader("Detailed Cost Breakdown")
 
-        cost_data = []
-        for material_id in st.session_state.selected_materials:
-            material = st.session_state.materials_df[
-                st.session_state.materials_df["id"] == material_id
-            ].iloc[0]
-            total_cost = material["cost_per_unit"] * st.session_state.project_area
-
-            cost_data.append(
-                {
-                    "Material": material["name"],
-                    "Type": material["type"],
-                    "Cost per Unit": f"${material['cost_per_unit']:.2f}",
-                    "Project Size": st.session_state.project_area,
-                    "Total Cost": f"${total_cost:.2f}",
-                }
-            )
-
-        cost_df = pd.DataFrame(cost_data)
-        st.dataframe(cost_df, use_container_width=True)
+        selected = st.session_state.materials_df.loc[
+            list(st.session_state.selected_materials)
+        ]
+        project_area = st.session_state.project_area
+        cost_df = pd.DataFrame(
+            {
+                "Material": selected["name"].to_numpy(),
+                "Type": selected["type"].to_numpy(),
+                "Cost per Unit": selected["cost_per_unit"].to_numpy(dtype=float),
+                "Project Size": project_area,
+                "Total Cost": selected["cost_per_unit"].to_numpy(dtype=float)
+                * project_area,
+            }
+        )
+        st.dataframe(
+            cost_df,
+            hide_index=True,
+            use_container_width=True,
+            column_config={
+                "Cost per Unit": st.column_config.NumberColumn(format="$%.2f"),
+                "Total Cost": st.column_config.NumberColumn(format="$%.2f"),
+            },
+        )
 
 
 def display_user_dashboard():
@@ -642,28 +741,9 @@ def main():
         st.subheader(f"Welcome, {st.session_state.username}!")
 
         # Navigation menu
-        if "selected_menu" not in st.session_state:
-            st.session_state.selected_menu = 0
-
-        menu_options = [
-            "Project Specifications",
-            "Recommendations",
-            "Material Comparison",
-            "Cost Analysis",
-            "My Projects",
-            "Help",
-        ]
-
-        if "selected_menu" not in st.session_state:
-            st.session_state.selected_menu = 0
-
-        # Update selected_menu before rendering option_menu to avoid double click issue
-        if "selected_menu" not in st.session_state:
-            st.session_state.selected_menu = 0
-
         selected = option_menu(
             menu_title=None,
-            options=menu_options,
+            options=MENU_OPTIONS,
             icons=[
                 "pencil-square",
                 "list-check",
@@ -707,10 +787,8 @@ def main():
     elif selected == "Help":
         display_help()
 
-    # Update the selected menu in session state only if changed
-    new_index = menu_options.index(selected)
-    if st.session_state.selected_menu != new_index:
-        st.session_state.selected_menu = new_index
+    # Remember the selection so programmatic menu switches are detected
+    st.session_state.selected_menu = MENU_INDEX[selected]
 
 
 if __name__ == "__main__":
@@ -7,6 +7,12 @@ import streamlit as st
 import re
 from db_utils import authenticate_user, register_user
 
+_EMAIL_RE = re.compile(r"^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$")
+# Username must be 3-20 characters and can only contain alphanumeric characters and underscores
+_USERNAME_RE = re.compile(r"^[a-zA-Z0-9_]{3,20}$")
+# Password needs an uppercase letter, a lowercase letter, a number and a special character
+_PASSWORD_RE = re.compile(r"^(?=.*[a-z])(?=.*[A-Z])(?=.*\d)(?=.*[^A-Za-z0-9])")
+
 
 # to check the valid state of a mail
 def is_valid_email(email):
@@ -19,8 +25,7 @@ def is_valid_email(email):
     Returns:
         bool: True if email is valid, False otherwise
     """
-    pattern = r"^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$"
-    return re.match(pattern, email) is not None
+    return _EMAIL_RE.match(email) is not None
 
 
 def is_valid_username(username):
@@ -33,9 +38,7 @@ def is_valid_username(username):
     Returns:
         bool: True if username is valid, False otherwise
     """
-    # Username must be 3-20 characters and can only contain alphanumeric characters and underscores
-    pattern = r"^[a-zA-Z0-9_]{3,20}$"
-    return re.match(pattern, username) is not None
+    return _USERNAME_RE.match(username) is not None
 
 
 def is_valid_password(password):
@@ -50,7 +53,9 @@ def is_valid_password(password):
     """
     # Password must be at least 8 characters and contain at least one uppercase letter,
     # one lowercase letter, one number, and one special character
-    return len(password) >= 8
+    if len(password) < 8:
+        return False
+    return _PASSWORD_RE.match(password) is not None
 
 
 def init_session_state():
@@ -117,7 +122,11 @@ def register_new_user(username, email, password, confirm_password):
         return False, "Please enter a valid email address."
 
     if not is_valid_password(password):
-        return False, "Password must be at least 8 characters long."
+        return (
+            False,
+            "Password must be at least 8 characters long and include an uppercase "
+            "letter, a lowercase letter, a number and a special character.",
+        )
 
     if password != confirm_password:
         return False, "Passwords do not match."
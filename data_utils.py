@@ -3,9 +3,87 @@ Data utility functions for the construction material recommendation system.
 This module contains functions for data processing and feature extraction.
 """
 
+import logging
+import os
+import time
+from dataclasses import dataclass
 import pandas as pd
 import numpy as np
-from material_data import get_material_properties, get_weather_properties
+from sklearn.preprocessing import MultiLabelBinarizer
+from material_data import (
+    get_material_properties,
+    get_weather_properties,
+    application_mask,
+    APPLICATION_BITS,
+    DATABASE_SOURCE,
+)
+
+logger = logging.getLogger(__name__)
+
+
+# Numeric material columns read by the scoring function
+SCORING_COLUMNS = [
+    "strength_mpa",
+    "durability_years",
+    "fire_resistance_hours",
+    "water_resistance",
+    "thermal_conductivity",
+    "eco_friendly_score",
+    "cost_per_unit",
+    "installation_complexity",
+]
+
+# Numeric material properties used as model features
+MATERIAL_FEATURES = get_material_properties()
+
+# Weather conditions, stored after the numeric columns in the scoring matrix
+WEATHER_CONDITIONS = get_weather_properties()
+
+
+def load_or_build(path, builder, max_age=None):
+    """
+    Load a DataFrame from a Parquet cache file, building and writing it if missing.
+
+    Only frames read from the database (``attrs["source"]`` set to
+    ``DATABASE_SOURCE``) are written, so the built-in fallback data is never
+    cached in place of the real catalog.
+
+    Args:
+        path (str): Path of the Parquet cache file
+        builder (callable): Function returning the DataFrame to cache
+        max_age (float): Seconds after which the cache file is rebuilt, or
+            None to keep it until it is deleted
+
+    Returns:
+        pd.DataFrame: Cached or freshly built DataFrame
+    """
+    if os.path.exists(path) and (
+        max_age is None or time.time() - os.path.getmtime(path) < max_age
+    ):
+        df = pd.read_parquet(path, engine="pyarrow")
+
+        # Parquet list columns come back as NumPy arrays, restore plain lists
+        for column in df.columns:
+            if not df.empty and isinstance(df[column].iloc[0], np.ndarray):
+                df[column] = df[column].map(list)
+
+        # String columns are read back with Python storage, keep them in Arrow
+        for column in df.select_dtypes("string").columns:
+            df[column] = df[column].astype("string[pyarrow]")
+
+        return df
+
+    df = builder()
+    if df.attrs.get("source") != DATABASE_SOURCE:
+        return df
+
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        df.to_parquet(path, engine="pyarrow", compression="zstd")
+    except OSError:
+        logger.exception("Error writing cache file %s", path)
+
+    return df
 
 
 def preprocess_material_data(materials_df):
@@ -19,25 +97,28 @@ def preprocess_material_data(materials_df):
         pd.DataFrame: Processed feature matrix for materials
     """
     # Extract the numerical properties as features
-    features = get_material_properties()
-    X = materials_df[features].copy()
+    X = materials_df[MATERIAL_FEATURES].copy()
 
     # Extract weather resistance scores and add them as features
-    weather_props = get_weather_properties()
-    for prop in weather_props:
-        X[f"weather_{prop}"] = materials_df["weather_resistance"].apply(
-            lambda x: x.get(prop, 0)
-        )
+    weather = (
+        pd.json_normalize(materials_df["weather_resistance"].tolist())
+        .reindex(columns=WEATHER_CONDITIONS, fill_value=0)
+        .fillna(0)
+        .add_prefix("weather_")
+    )
+    weather.index = materials_df.index
+    X = pd.concat([X, weather], axis=1)
 
     # Create dummy variables for material type and application
     type_dummies = pd.get_dummies(materials_df["type"], prefix="type")
 
     # For applications (which is a list column), we need to process differently
-    app_dummies = pd.DataFrame()
-    for app in set(app for apps in materials_df["applications"] for app in apps):
-        app_dummies[f"app_{app}"] = materials_df["applications"].apply(
-            lambda x: 1 if app in x else 0
-        )
+    mlb = MultiLabelBinarizer()
+    app_dummies = pd.DataFrame(
+        mlb.fit_transform(materials_df["applications"]),
+        columns=[f"app_{app}" for app in mlb.classes_],
+        index=materials_df.index,
+    )
 
     # Combine all features
     X = pd.concat([X, type_dummies, app_dummies], axis=1)
@@ -101,22 +182,163 @@ def extract_project_features(project_specs):
     return project_features
 
 
-def calculate_material_scores(materials_df, project_specs):
+def build_scoring_matrix(materials_df):
+    """
+    Stack the numeric scoring columns and weather resistances into a single
+    float32 matrix.
+
+    The matrix is column-major, so each property is a contiguous array.
+    Weather resistances missing from a material default to 5.
+
+    Args:
+        materials_df (pd.DataFrame): Materials database
+
+    Returns:
+        np.ndarray: Matrix of shape
+            (n_materials, len(SCORING_COLUMNS) + len(WEATHER_CONDITIONS))
+    """
+    weather = (
+        pd.json_normalize(materials_df["weather_resistance"].tolist())
+        .reindex(columns=WEATHER_CONDITIONS)
+        .fillna(5)
+    )
+    return np.asfortranarray(
+        np.hstack(
+            [
+                materials_df[SCORING_COLUMNS].to_numpy(dtype=np.float32),
+                weather.to_numpy(dtype=np.float32),
+            ]
+        )
+    )
+
+
+@dataclass(slots=True)
+class ScoringRequest:
+    """
+    Project specifications parsed once into the values used for scoring.
+
+    Attributes:
+        applications (list): Requested applications
+        material_types (list): Preferred material types, empty for no preference
+        min_strength_mpa (float): Minimum strength, 0 to ignore
+        min_durability_years (float): Minimum durability, 0 to ignore
+        fire_resistance_requirement (float): Minimum fire resistance, 0 to ignore
+        water_resistance_requirement (float): Minimum water resistance, 0 to ignore
+        thermal_requirement (str): "low" or "high" conductivity, None to ignore
+        eco_friendly_requirement (float): Minimum eco score, 0 to ignore
+        budget_constraint (float): Budget per unit, None to ignore
+        installation_time_constraint (str): "low" or "high", None to ignore
+        weather_importance (np.ndarray): Importance of each of WEATHER_CONDITIONS
+            on a 0-1 scale
+    """
+
+    applications: list
+    material_types: list
+    min_strength_mpa: float
+    min_durability_years: float
+    fire_resistance_requirement: float
+    water_resistance_requirement: float
+    thermal_requirement: str | None
+    eco_friendly_requirement: float
+    budget_constraint: float | None
+    installation_time_constraint: str | None
+    weather_importance: np.ndarray
+
+    @classmethod
+    def from_specs(cls, project_specs):
+        """
+        Build a scoring request from a project specifications dict.
+
+        Args:
+            project_specs (dict): Project specifications
+
+        Returns:
+            ScoringRequest: Parsed scoring request
+        """
+        applications = project_specs.get("applications", [])
+        if not isinstance(applications, list):
+            applications = [applications]
+
+        material_types = project_specs.get("material_types", []) or []
+        if not isinstance(material_types, list):
+            material_types = [material_types]
+
+        env_conditions = project_specs.get("environmental_conditions", {}) or {}
+        weather_importance = np.maximum(
+            np.array(
+                [env_conditions.get(c, 0) / 10 for c in WEATHER_CONDITIONS],
+                dtype=np.float32,
+            ),
+            0,
+        )
+
+        return cls(
+            applications=applications,
+            material_types=material_types,
+            min_strength_mpa=project_specs.get("min_strength_mpa", 0),
+            min_durability_years=project_specs.get("min_durability_years", 0),
+            fire_resistance_requirement=project_specs.get(
+                "fire_resistance_requirement", 0
+            ),
+            water_resistance_requirement=project_specs.get(
+                "water_resistance_requirement", 0
+            ),
+            thermal_requirement=project_specs.get("thermal_requirement", None),
+            eco_friendly_requirement=project_specs.get("eco_friendly_requirement", 0),
+            budget_constraint=project_specs.get("budget_constraint", None),
+            installation_time_constraint=project_specs.get(
+                "installation_time_constraint", None
+            ),
+            weather_importance=weather_importance,
+        )
+
+
+def requirement_score(values, requirement):
+    """
+    Score values against a minimum requirement on a 0-10 scale.
+
+    Args:
+        values (np.ndarray): Material property values
+        requirement (float): Minimum required value
+
+    Returns:
+        np.ndarray: 10 where the requirement is met, proportionally less otherwise
+    """
+    # Branchless form of where(values >= requirement, 10, 10 * values / requirement)
+    return np.minimum(values / requirement, 1.0) * 10
+
+
+def calculate_material_scores(
+    materials_df, project_specs, scoring_matrix=None, top_n=None
+):
     """
     Calculate scores for each material based on project specifications.
 
     Args:
         materials_df (pd.DataFrame): Materials database
-        project_specs (dict): Project specifications
+        project_specs (dict or ScoringRequest): Project specifications
+        scoring_matrix (np.ndarray, optional): Precomputed output of
+            build_scoring_matrix for materials_df. Defaults to None.
+        top_n (int, optional): Only return the top_n highest scoring
+            materials. Defaults to None (all materials).
 
     Returns:
         pd.DataFrame: DataFrame with material scores
     """
-    # Create a copy of the materials dataframe to add scores
-    scored_materials = materials_df.copy()
+    if isinstance(project_specs, ScoringRequest):
+        request = project_specs
+    else:
+        request = ScoringRequest.from_specs(project_specs)
+
+    if scoring_matrix is None:
+        scoring_matrix = build_scoring_matrix(materials_df)
+    properties = dict(zip(SCORING_COLUMNS, scoring_matrix.T))
+    weather_matrix = scoring_matrix[:, len(SCORING_COLUMNS) :]
 
-    # Initialize score column
-    scored_materials["total_score"] = 0
+    # Sub-score arrays by output column and their weights, combined into the
+    # total and written back to the DataFrame in one step at the end
+    sub_scores = {}
+    sub_weights = []
 
     # Weight factors for different aspects
     weights = {
@@ -135,173 +357,145 @@ def calculate_material_scores(materials_df, project_specs):
     }
 
     # Score for application match
-    requested_applications = project_specs.get("applications", [])
-    if not isinstance(requested_applications, list):
-        requested_applications = [requested_applications]
-
-    scored_materials["application_score"] = (
-        scored_materials["applications"].apply(
-            lambda x: sum(1 for app in requested_applications if app in x)
-            / max(1, len(requested_applications))
+    requested_applications = request.applications
+
+    # Count matches with a popcount on the application bitmask when every
+    # requested application has a bit, otherwise check the lists directly
+    if (
+        "app_mask" in materials_df.columns
+        and all(app in APPLICATION_BITS for app in requested_applications)
+        and len(set(requested_applications)) == len(requested_applications)
+    ):
+        requested_mask = np.uint64(application_mask(requested_applications))
+        matches = np.bitwise_count(
+            materials_df["app_mask"].to_numpy() & requested_mask
         )
-        * 10
-    )
-    scored_materials["total_score"] += (
-        scored_materials["application_score"] * weights["application_match"]
+    else:
+        matches = (
+            materials_df["applications"]
+            .apply(lambda x: sum(1 for app in requested_applications if app in x))
+            .to_numpy()
+        )
+
+    sub_scores["application_score"] = (
+        matches / max(1, len(requested_applications)) * 10
     )
+    sub_weights.append(weights["application_match"])
 
     # Score for material type preference
-    preferred_types = project_specs.get("material_types", [])
+    preferred_types = request.material_types
     if preferred_types:
-        if not isinstance(preferred_types, list):
-            preferred_types = [preferred_types]
-
-        scored_materials["type_score"] = scored_materials["type"].apply(
-            lambda x: 10 if x in preferred_types else 5
-        )
-        scored_materials["total_score"] += (
-            scored_materials["type_score"] * weights["strength"]
+        sub_scores["type_score"] = np.where(
+            materials_df["type"].isin(preferred_types).to_numpy(), 10, 5
         )
+        sub_weights.append(weights["strength"])
 
     # Score for strength
-    min_strength = project_specs.get("min_strength_mpa", 0)
+    min_strength = request.min_strength_mpa
     if min_strength > 0:
-        scored_materials["strength_score"] = np.where(
-            scored_materials["strength_mpa"] >= min_strength,
-            10,
-            10 * (scored_materials["strength_mpa"] / min_strength),
-        )
-        scored_materials["total_score"] += (
-            scored_materials["strength_score"] * weights["strength"]
+        strength_score = requirement_score(
+            properties["strength_mpa"], min_strength
         )
+        sub_scores["strength_score"] = strength_score
+        sub_weights.append(weights["strength"])
 
     # Score for durability
-    min_durability = project_specs.get("min_durability_years", 0)
+    min_durability = request.min_durability_years
     if min_durability > 0:
-        scored_materials["durability_score"] = np.where(
-            scored_materials["durability_years"] >= min_durability,
-            10,
-            10 * (scored_materials["durability_years"] / min_durability),
-        )
-        scored_materials["total_score"] += (
-            scored_materials["durability_score"] * weights["durability"]
+        durability_score = requirement_score(
+            properties["durability_years"], min_durability
         )
+        sub_scores["durability_score"] = durability_score
+        sub_weights.append(weights["durability"])
 
     # Score for fire resistance
-    fire_req = project_specs.get("fire_resistance_requirement", 0)
+    fire_req = request.fire_resistance_requirement
     if fire_req > 0:
-        scored_materials["fire_score"] = np.where(
-            scored_materials["fire_resistance_hours"] >= fire_req,
-            10,
-            10 * (scored_materials["fire_resistance_hours"] / fire_req),
-        )
-        scored_materials["total_score"] += (
-            scored_materials["fire_score"] * weights["fire_resistance"]
+        fire_score = requirement_score(
+            properties["fire_resistance_hours"], fire_req
         )
+        sub_scores["fire_score"] = fire_score
+        sub_weights.append(weights["fire_resistance"])
 
     # Score for water resistance
-    water_req = project_specs.get("water_resistance_requirement", 0)
+    water_req = request.water_resistance_requirement
     if water_req > 0:
-        scored_materials["water_score"] = np.where(
-            scored_materials["water_resistance"] >= water_req,
-            10,
-            10 * (scored_materials["water_resistance"] / water_req),
-        )
-        scored_materials["total_score"] += (
-            scored_materials["water_score"] * weights["water_resistance"]
-        )
+        water_score = requirement_score(properties["water_resistance"], water_req)
+        sub_scores["water_score"] = water_score
+        sub_weights.append(weights["water_resistance"])
 
     # Score for thermal properties
-    thermal_req = project_specs.get("thermal_requirement", None)
+    thermal_req = request.thermal_requirement
     if thermal_req is not None:
+        conductivity = properties["thermal_conductivity"]
         if thermal_req == "low":  # Good insulation
-            scored_materials["thermal_score"] = 10 - (
-                scored_materials["thermal_conductivity"] / 10
-            )
+            thermal_score = 10 - (conductivity / 10)
         else:  # High conductivity
-            scored_materials["thermal_score"] = (
-                scored_materials["thermal_conductivity"] / 10
-            )
+            thermal_score = conductivity / 10
 
-        scored_materials["thermal_score"] = scored_materials["thermal_score"].clip(
-            0, 10
-        )
-        scored_materials["total_score"] += (
-            scored_materials["thermal_score"] * weights["thermal"]
-        )
+        thermal_score = np.clip(thermal_score, 0, 10)
+        sub_scores["thermal_score"] = thermal_score
+        sub_weights.append(weights["thermal"])
 
     # Score for eco-friendliness
-    eco_req = project_specs.get("eco_friendly_requirement", 0)
+    eco_req = request.eco_friendly_requirement
     if eco_req > 0:
-        scored_materials["eco_score"] = np.where(
-            scored_materials["eco_friendly_score"] >= eco_req,
-            10,
-            10 * (scored_materials["eco_friendly_score"] / eco_req),
-        )
-        scored_materials["total_score"] += (
-            scored_materials["eco_score"] * weights["eco_friendly"]
-        )
+        eco_score = requirement_score(properties["eco_friendly_score"], eco_req)
+        sub_scores["eco_score"] = eco_score
+        sub_weights.append(weights["eco_friendly"])
 
     # Score for cost (lower is better)
-    budget = project_specs.get("budget_constraint", None)
+    budget = request.budget_constraint
     if budget is not None:
-        scored_materials["cost_score"] = np.where(
-            scored_materials["cost_per_unit"] <= budget,
-            10,
-            10 * (budget / scored_materials["cost_per_unit"]),
-        )
-        scored_materials["total_score"] += (
-            scored_materials["cost_score"] * weights["cost"]
-        )
-
-    # Score for weather resistance
-    env_conditions = project_specs.get("environmental_conditions", {})
-    if env_conditions:
-        weather_score = 0
-        count = 0
-
-        for condition, importance in env_conditions.items():
-            if importance > 0 and condition in ["heat", "cold", "humidity", "uv"]:
-                weather_score += (
-                    scored_materials["weather_resistance"].apply(
-                        lambda x: x.get(condition, 5)
-                    )
-                    * importance
-                    / 10
-                )
-                count += importance / 10
-
-        if count > 0:
-            scored_materials["weather_score"] = weather_score / count
-            scored_materials["total_score"] += (
-                scored_materials["weather_score"] * weights["weather"]
-            )
+        cost = properties["cost_per_unit"]
+        # Free materials are always within budget, even when the budget is 0
+        budget_ratio = np.divide(budget, cost, out=np.ones_like(cost), where=cost > 0)
+        cost_score = np.minimum(budget_ratio, 1.0) * 10
+        sub_scores["cost_score"] = cost_score
+        sub_weights.append(weights["cost"])
+
+    # Score for weather resistance, weighted by the importance of each condition
+    importance = request.weather_importance
+    count = importance.sum()
+    if count > 0:
+        sub_scores["weather_score"] = weather_matrix @ importance / count
+        sub_weights.append(weights["weather"])
 
     # Score for installation complexity (lower is better)
-    install_constraint = project_specs.get("installation_time_constraint", None)
+    install_constraint = request.installation_time_constraint
     if install_constraint is not None:
+        complexity = properties["installation_complexity"]
         if install_constraint == "low":
-            scored_materials["install_score"] = (
-                10 - scored_materials["installation_complexity"]
-            )
+            install_score = 10 - complexity
         else:
-            scored_materials["install_score"] = scored_materials[
-                "installation_complexity"
-            ]
+            install_score = complexity
 
-        scored_materials["total_score"] += (
-            scored_materials["install_score"] * weights["installation"]
-        )
+        sub_scores["install_score"] = install_score
+        sub_weights.append(weights["installation"])
+
+    # Weighted sum of all sub-scores as a single matrix-vector product
+    total_score = np.column_stack(list(sub_scores.values())).astype(
+        np.float32
+    ) @ np.array(sub_weights, dtype=np.float32)
 
     # Normalize the total score
     total_weight = sum(w for k, w in weights.items())
-    scored_materials["total_score"] = (
-        scored_materials["total_score"] / total_weight * 10
+    total_score = total_score / total_weight * 10
+
+    # Sort by total score in descending order. When only the best materials
+    # are needed, select them with a partial sort and order just those rows
+    if top_n is not None and top_n < len(total_score):
+        order = np.argpartition(-total_score, top_n)[:top_n]
+        order = order[np.argsort(-total_score[order], kind="stable")]
+    else:
+        order = np.argsort(-total_score, kind="stable")
+
+    # Only the selected rows are copied out of the materials database
+    scored_materials = materials_df.iloc[order].assign(
+        **{name: score[order] for name, score in sub_scores.items()},
+        total_score=total_score[order],
     )
 
-    # Sort by total score in descending order
-    scored_materials = scored_materials.sort_values(by="total_score", ascending=False)
-
     return scored_materials
 
 
@@ -316,4 +510,10 @@ def filter_materials_by_application(materials_df, application):
     Returns:
         pd.DataFrame: Filtered materials
     """
-    return materials_df[materials_df["applications"].apply(lambda x: application in x)]
+    bit = APPLICATION_BITS.get(application)
+    if bit is None or "app_mask" not in materials_df.columns:
+        return materials_df[
+            materials_df["applications"].apply(lambda x: application in x)
+        ]
+
+    return materials_df[(materials_df["app_mask"].to_numpy() & bit) != 0]
@@ -3,12 +3,20 @@ Database utility functions for the construction material recommendation system.
 This module handles database connections and operations.
 """
 
+import functools
+import logging
 import streamlit as st
 import os
-import json
+import orjson
 from sqlalchemy import (
     create_engine,
     text,
+    bindparam,
+    select,
+    insert,
+    delete,
+    update,
+    func,
     Column,
     Integer,
     String,
@@ -17,19 +25,110 @@ from sqlalchemy import (
     ForeignKey,
     DateTime,
     TIMESTAMP,
+    Index,
+    Text,
+    cast,
 )
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.schema import CreateIndex
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker, relationship
 import datetime
-from passlib.hash import pbkdf2_sha256
+from passlib.context import CryptContext
 import pandas as pd
 
-# Create a SQLAlchemy engine
+logger = logging.getLogger(__name__)
+
+
+def _orjson_dumps(value):
+    """Serialize a value to a JSON string with orjson."""
+    return orjson.dumps(value).decode()
+
+
+@functools.lru_cache(maxsize=1)
+def get_engine():
+    """
+    Create the SQLAlchemy engine once per process.
+
+    Returns:
+        sqlalchemy.engine.Engine: Engine bound to the configured database
+    """
+    # Keep recently used connections warm (LIFO) and check them before use so
+    # connections dropped by the server are replaced transparently
+    db_engine = create_engine(
+        st.secrets["DATABASE_URL"],
+        pool_size=10,
+        max_overflow=20,
+        pool_timeout=30,
+        pool_recycle=1800,
+        pool_pre_ping=True,
+        pool_use_lifo=True,
+        # Encode and decode JSON columns (project specs) with orjson
+        json_serializer=_orjson_dumps,
+        json_deserializer=orjson.loads,
+    )
+    logger.debug("DB configured")
+    return db_engine
 
-DATABASE_URL = st.secrets["DATABASE_URL"]
-print("DATABASE_URL =", DATABASE_URL)
 
-engine = create_engine(DATABASE_URL)
+# Create a SQLAlchemy engine
+engine = get_engine()
+
+# New passwords are hashed with Argon2; existing PBKDF2 hashes still verify
+# and are flagged for an upgrade on the next successful login
+pwd_context = CryptContext(schemes=["argon2", "pbkdf2_sha256"], deprecated="auto")
+
+
+# Columns of the materials and suppliers tables
+MATERIAL_COLUMNS = [
+    "id",
+    "name",
+    "type",
+    "applications",
+    "strength_mpa",
+    "durability_years",
+    "thermal_conductivity",
+    "fire_resistance_hours",
+    "water_resistance",
+    "eco_friendly_score",
+    "cost_per_unit",
+    "availability",
+    "maintenance_requirement",
+    "weather_resistance",
+    "installation_complexity",
+    "supplier_id",
+]
+SUPPLIER_COLUMNS = [
+    "supplier_id",
+    "name",
+    "location",
+    "delivery_time_days",
+    "reliability_score",
+    "price_level",
+    "contact",
+]
+MATERIAL_JSON_COLUMNS = ["applications", "weather_resistance"]
+
+# Rows fetched per round trip when streaming the materials table
+MATERIALS_CHUNK_SIZE = 1000
+
+# Seconds a catalog read is reused before the database is queried again
+CATALOG_CACHE_TTL = 300
+
+# PostgreSQL casts the JSON columns server-side so the driver returns lists
+# and dicts; other databases return them as text that is decoded in Python
+_DECODE_JSON_IN_PYTHON = engine.dialect.name != "postgresql"
+_MATERIALS_QUERY = text(
+    "SELECT "
+    + ", ".join(
+        column
+        if _DECODE_JSON_IN_PYTHON or column not in MATERIAL_JSON_COLUMNS
+        else f"{column}::jsonb AS {column}"
+        for column in MATERIAL_COLUMNS
+    )
+    + " FROM materials"
+)
+_SUPPLIERS_QUERY = text(f"SELECT {', '.join(SUPPLIER_COLUMNS)} FROM suppliers")
 
 
 # Create a Base class for declarative models
@@ -41,6 +140,11 @@ class User(Base):
     """User model for authentication and authorization."""
 
     __tablename__ = "users"
+    # Case-insensitive email lookups at login seek this index, and it keeps
+    # addresses that differ only in case from registering twice
+    __table_args__ = (
+        Index("ix_users_lower_email", text("lower(email)"), unique=True),
+    )
 
     id = Column(Integer, primary_key=True)
     username = Column(String(100), unique=True, nullable=False)
@@ -55,25 +159,30 @@ class User(Base):
     @classmethod
     def hash_password(cls, password):
         """Hash a password for storing."""
-        return pbkdf2_sha256.hash(password)
+        return pwd_context.hash(password)
 
     @classmethod
     def verify_password(cls, stored_hash, provided_password):
         """Verify a stored password against a provided password."""
-        return pbkdf2_sha256.verify(provided_password, stored_hash)
+        return pwd_context.verify(provided_password, stored_hash)
 
 
 class UserProject(Base):
     """User projects model for storing saved projects."""
 
     __tablename__ = "user_projects"
+    # Serves the per-user project list ordered by most recent update. Lookups
+    # by (id, user_id) are already covered by the primary key
+    __table_args__ = (
+        Index("ix_user_projects_user_updated", "user_id", text("updated_at DESC")),
+    )
 
     id = Column(Integer, primary_key=True)
     user_id = Column(
         Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False
     )
     project_name = Column(String(100), nullable=False)
-    project_specs = Column(JSON, nullable=False)
+    project_specs = Column(JSON().with_variant(JSONB, "postgresql"), nullable=False)
     created_at = Column(TIMESTAMP, default=datetime.datetime.utcnow)
     updated_at = Column(
         TIMESTAMP, default=datetime.datetime.utcnow, onupdate=datetime.datetime.utcnow
@@ -82,15 +191,95 @@ class UserProject(Base):
     user = relationship("User", back_populates="projects")
 
 
-# Create a Session class
-Session = sessionmaker(bind=engine)
+# Create a Session class. Objects keep their loaded state after commit, so
+# reading e.g. a new project's id does not trigger another SELECT
+Session = sessionmaker(bind=engine, expire_on_commit=False)
+
+# Statements for the frequent auth and project lookups, built once at import
+# so each call only binds parameters. Bind names use a b_ prefix because
+# column names are reserved in UPDATE statements
+_owned_project = (UserProject.id == bindparam("b_project_id")) & (
+    UserProject.user_id == bindparam("b_user_id")
+)
+_USER_BY_LOGIN_STMT = (
+    select(User)
+    .where(
+        (User.username == bindparam("login"))
+        | (func.lower(User.email) == func.lower(bindparam("login")))
+    )
+    .limit(1)
+)
+_USER_PROJECTS_STMT = (
+    select(
+        UserProject.id,
+        UserProject.project_name.label("name"),
+        UserProject.created_at,
+        UserProject.updated_at,
+    )
+    .where(UserProject.user_id == bindparam("b_user_id"))
+    .order_by(UserProject.updated_at.desc())
+)
+_PROJECT_BY_ID_STMT = select(
+    UserProject.id,
+    UserProject.project_name.label("name"),
+    UserProject.project_specs.label("specs"),
+    UserProject.created_at,
+    UserProject.updated_at,
+).where(_owned_project)
+_DELETE_PROJECT_STMT = delete(UserProject).where(_owned_project)
+_UPDATE_PROJECT_STMT = (
+    update(UserProject)
+    .where(_owned_project)
+    .values(
+        project_name=bindparam("b_project_name"),
+        project_specs=bindparam("b_project_specs"),
+        updated_at=func.current_timestamp(),
+    )
+)
 
 
 def create_tables():
     """Create all tables in the database."""
     Base.metadata.create_all(engine)
 
-
+    # Databases created before project_specs became JSONB keep a json
+    # column, which create_all does not alter
+    if engine.dialect.name == "postgresql":
+        try:
+            with engine.begin() as conn:
+                specs_type = conn.execute(
+                    text(
+                        "SELECT data_type FROM information_schema.columns "
+                        "WHERE table_name = 'user_projects' "
+                        "AND column_name = 'project_specs'"
+                    )
+                ).scalar()
+                if specs_type == "json":
+                    conn.execute(
+                        text(
+                            "ALTER TABLE user_projects ALTER COLUMN project_specs "
+                            "TYPE jsonb USING project_specs::jsonb"
+                        )
+                    )
+        except Exception:
+            logger.exception("Error converting project_specs to JSONB")
+
+    # create_all skips tables that already exist, add any missing indexes.
+    # IF NOT EXISTS also covers expression indexes, which are not reflected
+    # on every backend and so can slip past a checkfirst lookup
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            try:
+                with engine.begin() as conn:
+                    conn.execute(CreateIndex(index, if_not_exists=True))
+            except Exception:
+                # Existing rows can violate a unique index added later (e.g.
+                # emails that differ only in case); the app still works
+                # without the index, so report it and carry on
+                logger.exception("Error creating index %s", index.name)
+
+
+@st.cache_data(ttl=CATALOG_CACHE_TTL, show_spinner=False)
 def get_material_from_db():
     """
     Get materials from the database.
@@ -98,42 +287,28 @@ def get_material_from_db():
     Returns:
         pd.DataFrame: DataFrame containing material information
     """
-    with Session() as session:
-        result = session.execute(text("SELECT * FROM materials"))
-        materials = []
-
-        for row in result:
-            material = {
-                "id": row.id,
-                "name": row.name,
-                "type": row.type,
-                "applications": (
-                    json.loads(row.applications)
-                    if isinstance(row.applications, str)
-                    else row.applications
-                ),
-                "strength_mpa": row.strength_mpa,
-                "durability_years": row.durability_years,
-                "thermal_conductivity": row.thermal_conductivity,
-                "fire_resistance_hours": row.fire_resistance_hours,
-                "water_resistance": row.water_resistance,
-                "eco_friendly_score": row.eco_friendly_score,
-                "cost_per_unit": row.cost_per_unit,
-                "availability": row.availability,
-                "maintenance_requirement": row.maintenance_requirement,
-                "weather_resistance": (
-                    json.loads(row.weather_resistance)
-                    if isinstance(row.weather_resistance, str)
-                    else row.weather_resistance
-                ),
-                "installation_complexity": row.installation_complexity,
-                "supplier_id": row.supplier_id,
-            }
-            materials.append(material)
+    # Stream the rows in chunks through a server-side cursor rather than
+    # buffering the whole result set in the driver first
+    with engine.connect() as conn:
+        conn = conn.execution_options(
+            stream_results=True, yield_per=MATERIALS_CHUNK_SIZE
+        )
+        chunks = pd.read_sql_query(
+            _MATERIALS_QUERY, conn, chunksize=MATERIALS_CHUNK_SIZE
+        )
+        materials_df = pd.concat(chunks, ignore_index=True)
+
+    # JSON columns arrive as text outside PostgreSQL, decode them column-wise
+    if _DECODE_JSON_IN_PYTHON:
+        for column in MATERIAL_JSON_COLUMNS:
+            materials_df[column] = materials_df[column].map(
+                lambda x: orjson.loads(x) if isinstance(x, str) else x
+            )
 
-        return pd.DataFrame(materials)
+    return materials_df
 
 
+@st.cache_data(ttl=CATALOG_CACHE_TTL, show_spinner=False)
 def get_supplier_from_db():
     """
     Get suppliers from the database.
@@ -141,23 +316,14 @@ def get_supplier_from_db():
     Returns:
         pd.DataFrame: DataFrame containing supplier information
     """
-    with Session() as session:
-        result = session.execute(text("SELECT * FROM suppliers"))
-        suppliers = []
+    with engine.connect() as conn:
+        return pd.read_sql_query(_SUPPLIERS_QUERY, conn)
 
-        for row in result:
-            supplier = {
-                "supplier_id": row.supplier_id,
-                "name": row.name,
-                "location": row.location,
-                "delivery_time_days": row.delivery_time_days,
-                "reliability_score": row.reliability_score,
-                "price_level": row.price_level,
-                "contact": row.contact,
-            }
-            suppliers.append(supplier)
 
-        return pd.DataFrame(suppliers)
+def clear_catalog_cache():
+    """Drop cached material and supplier tables after they are modified."""
+    get_material_from_db.clear()
+    get_supplier_from_db.clear()
 
 
 def register_user(username, email, password):
@@ -174,28 +340,33 @@ def register_user(username, email, password):
     """
     try:
         with Session() as session:
-            # Check if username or email already exists
-            existing_user = (
-                session.query(User)
-                .filter((User.username == username) | (User.email == email))
-                .first()
-            )
-
-            if existing_user:
-                return False
-
             # Hash password
             password_hash = User.hash_password(password)
 
-            # Create new user
-            new_user = User(username=username, email=email, password_hash=password_hash)
-
-            session.add(new_user)
+            # Insert the user unless the username or email is taken, in a
+            # single atomic statement
+            result = session.execute(
+                text(
+                    """
+                INSERT INTO users (username, email, password_hash, created_at)
+                VALUES (:username, :email, :password_hash, :created_at)
+                ON CONFLICT DO NOTHING
+                RETURNING id
+                """
+                ),
+                {
+                    "username": username,
+                    "email": email,
+                    "password_hash": password_hash,
+                    "created_at": datetime.datetime.utcnow(),
+                },
+            )
+            user_id = result.scalar()
             session.commit()
 
-            return True
-    except Exception as e:
-        print(f"Error registering user: {e}")
+            return user_id is not None
+    except Exception:
+        logger.exception("Error registering user")
         return False
 
 
@@ -213,21 +384,30 @@ def authenticate_user(username_or_email, password):
     try:
         with Session() as session:
             # Find user by username or email
-            user = (
-                session.query(User)
-                .filter(
-                    (User.username == username_or_email)
-                    | (User.email == username_or_email)
-                )
-                .first()
+            user = session.scalars(
+                _USER_BY_LOGIN_STMT, {"login": username_or_email}
+            ).first()
+
+            # Always run a hash verification so the response time does not
+            # reveal whether the username or email exists
+            if not user:
+                pwd_context.dummy_verify()
+                return None
+
+            password_ok, new_hash = pwd_context.verify_and_update(
+                password, user.password_hash
             )
+            if not password_ok:
+                return None
 
-            if user and User.verify_password(user.password_hash, password):
-                return user
+            # Rehash legacy PBKDF2 passwords with Argon2
+            if new_hash:
+                user.password_hash = new_hash
+                session.commit()
 
-            return None
-    except Exception as e:
-        print(f"Error authenticating user: {e}")
+            return user
+    except Exception:
+        logger.exception("Error authenticating user")
         return None
 
 
@@ -245,17 +425,59 @@ def save_user_project(user_id, project_name, project_specs):
     """
     try:
         with Session() as session:
-            # Create new project
-            new_project = UserProject(
-                user_id=user_id, project_name=project_name, project_specs=project_specs
-            )
+            # Insert the project and read its id back in the same statement
+            project_id = session.execute(
+                insert(UserProject)
+                .values(
+                    user_id=user_id,
+                    project_name=project_name,
+                    project_specs=project_specs,
+                )
+                .returning(UserProject.id)
+            ).scalar_one()
+            session.commit()
+
+            return project_id
+    except Exception:
+        logger.exception("Error saving project")
+        return None
+
+
+def save_user_project_raw(user_id, project_name, specs_json):
+    """
+    Save a user project from specifications that are already JSON encoded.
+
+    The JSON text is bound as-is instead of being decoded and re-encoded by
+    the JSON column type.
+
+    Args:
+        user_id (int): User ID
+        project_name (str): Project name
+        specs_json (str): JSON encoded project specifications
+
+    Returns:
+        int: Project ID if successful, None otherwise
+    """
+    try:
+        specs_value = bindparam("specs_json", specs_json, type_=Text)
+        if engine.dialect.name == "postgresql":
+            specs_value = cast(specs_value, JSONB)
 
-            session.add(new_project)
+        with Session() as session:
+            project_id = session.execute(
+                insert(UserProject)
+                .values(
+                    user_id=user_id,
+                    project_name=project_name,
+                    project_specs=specs_value,
+                )
+                .returning(UserProject.id)
+            ).scalar_one()
             session.commit()
 
-            return new_project.id
-    except Exception as e:
-        print(f"Error saving project: {e}")
+            return project_id
+    except Exception:
+        logger.exception("Error saving project")
         return None
 
 
@@ -263,35 +485,22 @@ def get_user_projects(user_id):
     """
     Get projects for a user.
 
+    Only the columns needed to list projects are loaded; use
+    get_project_by_id to fetch a project's specifications.
+
     Args:
         user_id (int): User ID
 
     Returns:
-        list: List of projects
+        list: List of projects with id, name, created_at and updated_at
     """
     try:
         with Session() as session:
-            projects = (
-                session.query(UserProject)
-                .filter(UserProject.user_id == user_id)
-                .order_by(UserProject.updated_at.desc())
-                .all()
-            )
+            result = session.execute(_USER_PROJECTS_STMT, {"b_user_id": user_id})
 
-            project_list = []
-            for project in projects:
-                project_dict = {
-                    "id": project.id,
-                    "name": project.project_name,
-                    "specs": project.project_specs,
-                    "created_at": project.created_at,
-                    "updated_at": project.updated_at,
-                }
-                project_list.append(project_dict)
-
-            return project_list
-    except Exception as e:
-        print(f"Error getting user projects: {e}")
+            return [dict(project) for project in result.mappings()]
+    except Exception:
+        logger.exception("Error getting user projects")
         return []
 
 
@@ -308,23 +517,15 @@ def delete_user_project(project_id, user_id):
     """
     try:
         with Session() as session:
-            # Find project
-            project = (
-                session.query(UserProject)
-                .filter(UserProject.id == project_id, UserProject.user_id == user_id)
-                .first()
+            # Delete the project only if it belongs to the user
+            result = session.execute(
+                _DELETE_PROJECT_STMT, {"b_project_id": project_id, "b_user_id": user_id}
             )
-
-            if not project:
-                return False
-
-            # Delete project
-            session.delete(project)
             session.commit()
 
-            return True
-    except Exception as e:
-        print(f"Error deleting project: {e}")
+            return result.rowcount == 1
+    except Exception:
+        logger.exception("Error deleting project")
         return False
 
 
@@ -342,23 +543,20 @@ def get_project_by_id(project_id, user_id):
     try:
         with Session() as session:
             project = (
-                session.query(UserProject)
-                .filter(UserProject.id == project_id, UserProject.user_id == user_id)
+                session.execute(
+                    _PROJECT_BY_ID_STMT,
+                    {"b_project_id": project_id, "b_user_id": user_id},
+                )
+                .mappings()
                 .first()
             )
 
             if not project:
                 return None
 
-            return {
-                "id": project.id,
-                "name": project.project_name,
-                "specs": project.project_specs,
-                "created_at": project.created_at,
-                "updated_at": project.updated_at,
-            }
-    except Exception as e:
-        print(f"Error getting project: {e}")
+            return dict(project)
+    except Exception:
+        logger.exception("Error getting project")
         return None
 
 
@@ -377,32 +575,22 @@ def update_user_project(project_id, user_id, project_name, project_specs):
     """
     try:
         with Session() as session:
-            # Find project
-            project = (
-                session.query(UserProject)
-                .filter(UserProject.id == project_id, UserProject.user_id == user_id)
-                .first()
+            # Update the project only if it belongs to the user, setting
+            # updated_at in the database in the same statement
+            result = session.execute(
+                _UPDATE_PROJECT_STMT,
+                {
+                    "b_project_id": project_id,
+                    "b_user_id": user_id,
+                    "b_project_name": project_name,
+                    "b_project_specs": project_specs,
+                },
             )
-
-            if not project:
-                return False
-
-            # Update project
-            project.project_name = project_name
-            project.project_specs = project_specs
-            # Set updated_at timestamp in the database
-            session.execute(
-                text(
-                    "UPDATE user_projects SET updated_at = CURRENT_TIMESTAMP WHERE id = :id"
-                ),
-                {"id": project_id},
-            )
-
             session.commit()
 
-            return True
-    except Exception as e:
-        print(f"Error updating project: {e}")
+            return result.rowcount == 1
+    except Exception:
+        logger.exception("Error updating project")
         return False
 
 
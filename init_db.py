@@ -3,13 +3,19 @@ Database initialization script for the construction material recommendation syst
 This script creates the database tables and populates them with initial data.
 """
 
-import os
 import json
-import pandas as pd
-from sqlalchemy import create_engine, text
-from db_utils import check_and_create_tables
+import logging
+from sqlalchemy import text
+from db_utils import (
+    check_and_create_tables,
+    clear_catalog_cache,
+    engine,
+    MATERIAL_COLUMNS,
+    SUPPLIER_COLUMNS,
+)
 from material_data import generate_material_database, generate_supplier_database
-import streamlit as st
+
+logger = logging.getLogger(__name__)
 
 
 def init_database():
@@ -19,15 +25,7 @@ def init_database():
     # Check and create tables
     check_and_create_tables()
 
-    # Get database URL from environment
-    DATABASE_URL = st.secrets.get("DATABASE_URL", "")
-    if not DATABASE_URL:
-        print("Error: DATABASE_URL environment variable not set.")
-        return
-
-    # Create engine
-    engine = create_engine(DATABASE_URL)
-
+    # Reuse the shared engine and its connection pool from db_utils
     try:
         # Check if materials table has data
         with engine.connect() as conn:
@@ -41,6 +39,8 @@ def init_database():
                 # Insert materials into database
                 insert_materials(materials_df, engine)
 
+                clear_catalog_cache()
+
                 print(f"Added {len(materials_df)} materials to the database.")
             else:
                 print(
@@ -59,6 +59,8 @@ def init_database():
                 # Insert suppliers into database
                 insert_suppliers(suppliers_df, engine)
 
+                clear_catalog_cache()
+
                 print(f"Added {len(suppliers_df)} suppliers to the database.")
             else:
                 print(
@@ -66,8 +68,8 @@ def init_database():
                 )
 
         print("Database initialization complete.")
-    except Exception as e:
-        print(f"Error initializing database: {e}")
+    except Exception:
+        logger.exception("Error initializing database")
 
 
 def insert_materials(materials_df, engine):
@@ -78,53 +80,38 @@ def insert_materials(materials_df, engine):
         materials_df (pd.DataFrame): Materials data
         engine: SQLAlchemy engine
     """
+    # JSON encode the list/dict columns and insert all rows in one executemany
+    records = (
+        materials_df[MATERIAL_COLUMNS]
+        .assign(
+            applications=materials_df["applications"].map(json.dumps),
+            weather_resistance=materials_df["weather_resistance"].map(json.dumps),
+        )
+        .to_dict(orient="records")
+    )
+
     with engine.connect() as conn:
-        for _, material in materials_df.iterrows():
-            # Convert weather_resistance to JSON string
-            weather_resistance = json.dumps(material["weather_resistance"])
-
-            # Convert applications to JSON string
-            applications = json.dumps(material["applications"])
-
-            # Insert material
-            conn.execute(
-                text(
-                    """
-                INSERT INTO materials (
-                    id, name, type, applications, strength_mpa, durability_years,
-                    thermal_conductivity, fire_resistance_hours, water_resistance,
-                    eco_friendly_score, cost_per_unit, availability,
-                    maintenance_requirement, weather_resistance, installation_complexity,
-                    supplier_id
-                ) VALUES (
-                    :id, :name, :type, :applications, :strength_mpa, :durability_years,
-                    :thermal_conductivity, :fire_resistance_hours, :water_resistance,
-                    :eco_friendly_score, :cost_per_unit, :availability,
-                    :maintenance_requirement, :weather_resistance, :installation_complexity,
-                    :supplier_id
-                )
-                ON CONFLICT (id) DO NOTHING
+        conn.execute(
+            text(
                 """
-                ),
-                {
-                    "id": int(material["id"]),
-                    "name": material["name"],
-                    "type": material["type"],
-                    "applications": applications,
-                    "strength_mpa": float(material["strength_mpa"]),
-                    "durability_years": int(material["durability_years"]),
-                    "thermal_conductivity": float(material["thermal_conductivity"]),
-                    "fire_resistance_hours": float(material["fire_resistance_hours"]),
-                    "water_resistance": int(material["water_resistance"]),
-                    "eco_friendly_score": int(material["eco_friendly_score"]),
-                    "cost_per_unit": float(material["cost_per_unit"]),
-                    "availability": int(material["availability"]),
-                    "maintenance_requirement": int(material["maintenance_requirement"]),
-                    "weather_resistance": weather_resistance,
-                    "installation_complexity": int(material["installation_complexity"]),
-                    "supplier_id": material["supplier_id"],
-                },
+            INSERT INTO materials (
+                id, name, type, applications, strength_mpa, durability_years,
+                thermal_conductivity, fire_resistance_hours, water_resistance,
+                eco_friendly_score, cost_per_unit, availability,
+                maintenance_requirement, weather_resistance, installation_complexity,
+                supplier_id
+            ) VALUES (
+                :id, :name, :type, :applications, :strength_mpa, :durability_years,
+                :thermal_conductivity, :fire_resistance_hours, :water_resistance,
+                :eco_friendly_score, :cost_per_unit, :availability,
+                :maintenance_requirement, :weather_resistance, :installation_complexity,
+                :supplier_id
             )
+            ON CONFLICT (id) DO NOTHING
+            """
+            ),
+            records,
+        )
         conn.commit()
 
 
@@ -136,32 +123,24 @@ def insert_suppliers(suppliers_df, engine):
         suppliers_df (pd.DataFrame): Suppliers data
         engine: SQLAlchemy engine
     """
+    records = suppliers_df[SUPPLIER_COLUMNS].to_dict(orient="records")
+
     with engine.connect() as conn:
-        for _, supplier in suppliers_df.iterrows():
-            # Insert supplier
-            conn.execute(
-                text(
-                    """
-                INSERT INTO suppliers (
-                    supplier_id, name, location, delivery_time_days,
-                    reliability_score, price_level, contact
-                ) VALUES (
-                    :supplier_id, :name, :location, :delivery_time_days,
-                    :reliability_score, :price_level, :contact
-                )
-                ON CONFLICT (supplier_id) DO NOTHING
+        conn.execute(
+            text(
                 """
-                ),
-                {
-                    "supplier_id": supplier["supplier_id"],
-                    "name": supplier["name"],
-                    "location": supplier["location"],
-                    "delivery_time_days": int(supplier["delivery_time_days"]),
-                    "reliability_score": int(supplier["reliability_score"]),
-                    "price_level": supplier["price_level"],
-                    "contact": supplier["contact"],
-                },
+            INSERT INTO suppliers (
+                supplier_id, name, location, delivery_time_days,
+                reliability_score, price_level, contact
+            ) VALUES (
+                :supplier_id, :name, :location, :delivery_time_days,
+                :reliability_score, :price_level, :contact
             )
+            ON CONFLICT (supplier_id) DO NOTHING
+            """
+            ),
+            records,
+        )
         conn.commit()
 
 
@@ -3,12 +3,15 @@ Material data module for the construction material recommendation system.
 This module contains the material database and related utility functions.
 """
 
+import logging
 import pandas as pd
 import numpy as np
 import os
 import json
 from db_utils import get_material_from_db, get_supplier_from_db
 
+logger = logging.getLogger(__name__)
+
 # Define material properties and their possible values
 MATERIAL_TYPES = [
     "Concrete",
@@ -36,6 +39,102 @@ APPLICATIONS = [
     "Interior Finishing",
 ]
 
+# Bit assigned to each application in the app_mask column
+APPLICATION_BITS = {application: 1 << i for i, application in enumerate(APPLICATIONS)}
+
+
+def application_mask(applications):
+    """
+    Encode a list of applications as a bitmask.
+
+    Args:
+        applications (list): Application names
+
+    Returns:
+        int: Bitmask with one bit set per known application
+    """
+    mask = 0
+    for application in applications:
+        mask |= APPLICATION_BITS.get(application, 0)
+    return mask
+
+
+# attrs["source"] of frames read from the database, as opposed to the
+# built-in fallback data
+DATABASE_SOURCE = "database"
+
+# Float material columns. They stay float64 in the generated database, so the
+# seed data written to the database keeps its exact values, and are narrowed
+# to float32 only in the app's in-memory copy. cost_per_unit is left out as it
+# is multiplied into the displayed project costs
+MATERIAL_FLOAT_COLUMNS = [
+    "strength_mpa",
+    "thermal_conductivity",
+    "fire_resistance_hours",
+]
+
+
+def downcast_columns(df, integer_columns=(), float_columns=(), category_columns=()):
+    """
+    Convert columns to the narrowest dtype that holds their values.
+
+    Args:
+        df (pd.DataFrame): DataFrame to convert in place
+        integer_columns (iterable): Columns downcast to the smallest integer type
+        float_columns (iterable): Columns downcast to float32
+        category_columns (iterable): Columns converted to categoricals
+
+    Returns:
+        pd.DataFrame: The converted DataFrame
+    """
+    for column in integer_columns:
+        df[column] = pd.to_numeric(df[column], downcast="integer")
+    for column in float_columns:
+        df[column] = pd.to_numeric(df[column], downcast="float")
+    for column in category_columns:
+        df[column] = df[column].astype("category")
+    return df
+
+
+def add_derived_columns(materials_df):
+    """
+    Add columns derived from the applications list.
+
+    app_mask is used for vectorized application filtering and
+    applications_str for display, so neither needs the list at render time.
+
+    Args:
+        materials_df (pd.DataFrame): Materials database
+
+    Returns:
+        pd.DataFrame: Materials database with the derived columns
+    """
+    materials_df["app_mask"] = (
+        materials_df["applications"].map(application_mask).astype("uint64")
+    )
+    materials_df["applications_str"] = materials_df["applications"].map(", ".join)
+
+    # Fixed type categories (plus any extra types found in the database) so the
+    # codes are stable, and Arrow-backed strings for the material names
+    extra_types = sorted(set(materials_df["type"].dropna()) - set(MATERIAL_TYPES))
+    materials_df["type"] = materials_df["type"].astype(
+        pd.CategoricalDtype(MATERIAL_TYPES + extra_types)
+    )
+    materials_df["name"] = materials_df["name"].astype("string[pyarrow]")
+
+    return downcast_columns(
+        materials_df,
+        integer_columns=[
+            "durability_years",
+            "water_resistance",
+            "eco_friendly_score",
+            "availability",
+            "maintenance_requirement",
+            "installation_complexity",
+        ],
+        category_columns=["supplier_id"],
+    )
+
 
 def generate_material_database():
     """
@@ -48,10 +147,12 @@ def generate_material_database():
         # First, try to get materials from the database
         materials_df = get_material_from_db()
         if not materials_df.empty:
+            materials_df = add_derived_columns(materials_df)
+            materials_df.attrs["source"] = DATABASE_SOURCE
             return materials_df
-    except Exception as e:
-        print(f"Error retrieving materials from database: {e}")
-        print("Using fallback material data...")
+    except Exception:
+        logger.exception("Error retrieving materials from database")
+        logger.warning("Using fallback material data")
 
     # Fallback to local data if database is unavailable
     materials = []
@@ -260,7 +361,7 @@ def generate_material_database():
     # Create a DataFrame from the materials list
     df = pd.DataFrame(materials)
 
-    return df
+    return add_derived_columns(df)
 
 
 def generate_supplier_database():
@@ -274,10 +375,12 @@ def generate_supplier_database():
         # First, try to get suppliers from the database
         suppliers_df = get_supplier_from_db()
         if not suppliers_df.empty:
+            suppliers_df = downcast_supplier_columns(suppliers_df)
+            suppliers_df.attrs["source"] = DATABASE_SOURCE
             return suppliers_df
-    except Exception as e:
-        print(f"Error retrieving suppliers from database: {e}")
-        print("Using fallback supplier data...")
+    except Exception:
+        logger.exception("Error retrieving suppliers from database")
+        logger.warning("Using fallback supplier data")
 
     # Fallback to local data if database is unavailable
     suppliers = [
@@ -418,7 +521,24 @@ def generate_supplier_database():
         },
     ]
 
-    return pd.DataFrame(suppliers)
+    return downcast_supplier_columns(pd.DataFrame(suppliers))
+
+
+def downcast_supplier_columns(suppliers_df):
+    """
+    Narrow the supplier column dtypes.
+
+    Args:
+        suppliers_df (pd.DataFrame): Suppliers database
+
+    Returns:
+        pd.DataFrame: Suppliers database with narrowed dtypes
+    """
+    return downcast_columns(
+        suppliers_df,
+        integer_columns=["delivery_time_days", "reliability_score"],
+        category_columns=["supplier_id", "price_level"],
+    )
 
 
 # get the material properties
@@ -461,6 +581,9 @@ def get_material_by_id(material_id, materials_df):
     """
     Get material information by ID.
 
+    Uses a hash lookup when the database is indexed by ``id`` and falls
+    back to a column scan otherwise.
+
     Args:
         material_id (int): Material ID
         materials_df (pd.DataFrame): Materials database
@@ -468,6 +591,8 @@ def get_material_by_id(material_id, materials_df):
     Returns:
         dict: Material information
     """
+    if materials_df.index.name == "id":
+        return materials_df.loc[material_id].to_dict()
     material = materials_df[materials_df["id"] == material_id].iloc[0].to_dict()
     return material
 
@@ -476,6 +601,9 @@ def get_supplier_by_id(supplier_id, suppliers_df):
     """
     Get supplier information by ID.
 
+    Uses a hash lookup when the database is indexed by ``supplier_id`` and
+    falls back to a column scan otherwise.
+
     Args:
         supplier_id (str): Supplier ID
         suppliers_df (pd.DataFrame): Suppliers database
@@ -483,6 +611,8 @@ def get_supplier_by_id(supplier_id, suppliers_df):
     Returns:
         dict: Supplier information
     """
+    if suppliers_df.index.name == "supplier_id":
+        return suppliers_df.loc[supplier_id].to_dict()
     supplier = (
         suppliers_df[suppliers_df["supplier_id"] == supplier_id].iloc[0].to_dict()
     )
@@ -9,16 +9,30 @@ from sklearn.preprocessing import StandardScaler
 from sklearn.neighbors import NearestNeighbors
 from sklearn.ensemble import RandomForestRegressor
 from material_data import generate_material_database, get_material_properties
-from data_utils import preprocess_material_data, extract_project_features
+from data_utils import (
+    preprocess_material_data,
+    extract_project_features,
+    build_scoring_matrix,
+)
 
 
 class MaterialRecommender:
     """Material recommendation model class."""
 
-    def __init__(self):
-        """Initialize the material recommender model."""
-        self.materials_df = generate_material_database()
+    def __init__(self, materials_df=None):
+        """
+        Initialize the material recommender model.
+
+        Args:
+            materials_df (pd.DataFrame, optional): Materials database.
+                Generated when not provided. Defaults to None.
+        """
+        if materials_df is None:
+            materials_df = generate_material_database()
+
+        self.materials_df = materials_df
         self.features_df = preprocess_material_data(self.materials_df)
+        self.scoring_matrix = build_scoring_matrix(self.materials_df)
         self.scaler = StandardScaler()
         self.scaled_features = self.scaler.fit_transform(self.features_df)
         self.knn_model = NearestNeighbors(n_neighbors=5, algorithm="auto")
@@ -80,10 +94,10 @@ class MaterialRecommender:
             list: List of similar material IDs
         """
 
-        # Get the index of the material in the dataframe
-        material_idx = self.materials_df[self.materials_df["id"] == material_id].index[
-            0
-        ]
+        # Get the row position of the material in the dataframe
+        material_idx = np.flatnonzero(
+            self.materials_df["id"].to_numpy() == material_id
+        )[0]
 
         # Get the feature vector for the material
         material_features = self.scaled_features[material_idx].reshape(1, -1)
@@ -143,7 +157,10 @@ class MaterialRecommender:
         from data_utils import calculate_material_scores
 
         # Calculate scores for each material based on project specifications
-        scored_materials = calculate_material_scores(self.materials_df, project_specs)
-
-        # Return the top N recommendations
-        return scored_materials.head(n_recommendations)
+        # and keep only the top N recommendations
+        return calculate_material_scores(
+            self.materials_df,
+            project_specs,
+            self.scoring_matrix,
+            top_n=n_recommendations,
+        )
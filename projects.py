@@ -8,6 +8,7 @@ import pandas as pd
 from datetime import datetime
 from db_utils import (
     save_user_project,
+    save_user_project_raw,
     get_user_projects,
     delete_user_project,
     get_project_by_id,
@@ -32,9 +33,14 @@ def save_current_project(user_id, project_name=None):
     if not project_name:
         project_name = f"Project {datetime.now().strftime('%Y-%m-%d %H:%M')}"
 
-    project_id = save_user_project(
-        user_id, project_name, st.session_state.project_specs
-    )
+    # Reuse the JSON encoded by update_project_specs when it is available
+    specs_json = st.session_state.get("specs_json")
+    if specs_json is not None:
+        project_id = save_user_project_raw(user_id, project_name, specs_json)
+    else:
+        project_id = save_user_project(
+            user_id, project_name, st.session_state.project_specs
+        )
 
     if project_id is not None:
         return True, f"Project '{project_name}' saved successfully!"
@@ -57,6 +63,7 @@ def load_project(project_id, user_id):
 
     if project:
         st.session_state.project_specs = project["specs"]
+        st.session_state.pop("specs_json", None)
 
         # Update all the individual state variables
         specs = project["specs"]
@@ -2,6 +2,8 @@
 Visualization module for the construction material recommendation system.
 """
 
+import itertools
+import weakref
 import streamlit as st
 import pandas as pd
 import numpy as np
@@ -9,14 +11,88 @@ import plotly.express as px
 import plotly.graph_objects as go
 from plotly.subplots import make_subplots
 
+# Live frames by catalog version, so a version is only trusted while the
+# frame it was given to is still alive
+_frame_versions = weakref.WeakValueDictionary()
+_next_version = itertools.count()
 
+
+def catalog_version(df):
+    """
+    Return a version number identifying a shared material or supplier frame.
+
+    The number is stored in ``df.attrs`` and stays valid for the frame's
+    lifetime. A frame that inherited it (``attrs`` are copied by pandas
+    operations) or that reuses a freed frame's address gets a new one.
+
+    Args:
+        df (pd.DataFrame): Materials or suppliers database
+
+    Returns:
+        int: Catalog version of the frame
+    """
+    version = df.attrs.get("catalog_version")
+    if version is None or _frame_versions.get(version) is not df:
+        version = next(_next_version)
+        df.attrs["catalog_version"] = version
+        _frame_versions[version] = df
+    return version
+
+
+# The material and supplier frames are shared read-only objects, so cached
+# figures are keyed on their catalog version instead of hashing their contents.
+# Figures are only read after they are built, so a cache hit returns the
+# shared object rather than unpickling a fresh copy
+cache_figure = st.cache_resource(
+    show_spinner=False, max_entries=64, hash_funcs={pd.DataFrame: catalog_version}
+)
+
+
+@st.cache_resource(
+    show_spinner=False, max_entries=8, hash_funcs={pd.DataFrame: catalog_version}
+)
+def _id_index(df, id_column):
+    """
+    Build a hashed index over a frame's ID column.
+
+    Args:
+        df (pd.DataFrame): Materials or suppliers database
+        id_column (str): Name of the ID column
+
+    Returns:
+        pd.Index: Index of the IDs in row order
+    """
+    return pd.Index(df[id_column])
+
+
+def select_rows(df, ids, id_column="id"):
+    """
+    Select the rows of a frame whose IDs are in ``ids``.
+
+    Looks the IDs up in the cached hash index instead of building a boolean
+    mask over the whole frame. Rows keep their original order and unknown
+    IDs are ignored, as with ``isin``.
+
+    Args:
+        df (pd.DataFrame): Materials or suppliers database
+        ids (tuple): IDs to select
+        id_column (str): Name of the ID column
+
+    Returns:
+        pd.DataFrame: Selected rows
+    """
+    positions = _id_index(df, id_column).get_indexer(list(ids))
+    return df.iloc[np.sort(positions[positions >= 0])]
+
+
+@cache_figure
 def visualize_material_comparison(materials_df, selected_material_ids):
     """
     Create a radar chart comparing material properties.
 
     Args:
         materials_df (pd.DataFrame): Materials database
-        selected_material_ids (list): List of selected material IDs
+        selected_material_ids (tuple): Selected material IDs
 
     Returns:
         go.Figure: Plotly figure object
@@ -25,7 +101,7 @@ def visualize_material_comparison(materials_df, selected_material_ids):
         return None
 
     # Filter the materials by selected IDs
-    selected_materials = materials_df[materials_df["id"].isin(selected_material_ids)]
+    selected_materials = select_rows(materials_df, selected_material_ids)
 
     # Properties to be compared
     properties = [
@@ -54,32 +130,30 @@ def visualize_material_comparison(materials_df, selected_material_ids):
     # Create figure
     fig = go.Figure()
 
-    # Normalize properties for radar chart
-    normalized_data = {}
-    for prop in properties:
-        max_val = max(selected_materials[prop].max(), 1)  # Avoid division by zero
-
-        # For cost and complexity, lower is better, so we invert
-        if prop in [
-            "cost_per_unit",
-            "maintenance_requirement",
-            "installation_complexity",
-        ]:
-            normalized_data[prop] = 1 - (selected_materials[prop] / max_val)
-        else:
-            normalized_data[prop] = selected_materials[prop] / max_val
+    # Normalize properties for radar chart, avoiding division by zero
+    values = selected_materials[properties].to_numpy(dtype=np.float64)
+    max_values = values.max(axis=0, initial=1)
 
-    # Add traces for each material
-    for _, material in selected_materials.iterrows():
-        values = [normalized_data[prop].loc[material.name] for prop in properties]
-        values.append(values[0])  # Close the loop
+    # For cost and complexity, lower is better, so we invert
+    invert = np.isin(
+        properties,
+        ["cost_per_unit", "maintenance_requirement", "installation_complexity"],
+    )
+    normalized = values / max_values
+    normalized = np.where(invert, 1 - normalized, normalized)
 
+    # Close the loop
+    normalized = np.concatenate([normalized, normalized[:, :1]], axis=1)
+    theta = property_names + [property_names[0]]
+
+    # Add traces for each material
+    for name, row in zip(selected_materials["name"], normalized):
         fig.add_trace(
             go.Scatterpolar(
-                r=values,
-                theta=property_names + [property_names[0]],  # Close the loop
+                r=row.tolist(),
+                theta=theta,
                 fill="toself",
-                name=material["name"],
+                name=name,
             )
         )
 
@@ -93,13 +167,14 @@ def visualize_material_comparison(materials_df, selected_material_ids):
     return fig
 
 
+@cache_figure
 def visualize_cost_analysis(materials_df, selected_material_ids, project_area=100):
     """
     Create a horizontal bar chart for cost analysis.
 
     Args:
         materials_df (pd.DataFrame): Materials database
-        selected_material_ids (list): List of selected material IDs
+        selected_material_ids (tuple): Selected material IDs
         project_area (float): Project area or quantity
 
     Returns:
@@ -109,7 +184,7 @@ def visualize_cost_analysis(materials_df, selected_material_ids, project_area=10
         return None
 
     # Filter materials by selected IDs
-    selected_materials = materials_df[materials_df["id"].isin(selected_material_ids)]
+    selected_materials = select_rows(materials_df, selected_material_ids)
 
     # Calculate total cost
     materials_with_cost = selected_materials.copy()
@@ -138,20 +213,21 @@ def visualize_cost_analysis(materials_df, selected_material_ids, project_area=10
     return fig
 
 
+@cache_figure
 def visualize_durability_vs_cost(materials_df, selected_material_ids=None):
     """
     Create a scatter plot of durability vs cost.
 
     Args:
         materials_df (pd.DataFrame): Materials database
-        selected_material_ids (list): List of selected material IDs
+        selected_material_ids (tuple): Selected material IDs
 
     Returns:
         go.Figure: Plotly figure object
     """
     # Use all materials if none are selected
     if selected_material_ids:
-        plot_materials = materials_df[materials_df["id"].isin(selected_material_ids)]
+        plot_materials = select_rows(materials_df, selected_material_ids)
     else:
         plot_materials = materials_df
 
@@ -165,6 +241,7 @@ def visualize_durability_vs_cost(materials_df, selected_material_ids=None):
         hover_name="name",
         text="name",
         title="Durability vs Cost",
+        render_mode="webgl",
         labels={
             "cost_per_unit": "Cost per Unit ($)",
             "durability_years": "Durability (years)",
@@ -179,6 +256,7 @@ def visualize_durability_vs_cost(materials_df, selected_material_ids=None):
         yaxis_title="Durability (years)",
         legend_title="Material Type",
         height=500,
+        uirevision="static",
     )
 
     # Adjust text position
@@ -187,13 +265,14 @@ def visualize_durability_vs_cost(materials_df, selected_material_ids=None):
     return fig
 
 
+@cache_figure
 def visualize_environmental_impact(materials_df, selected_material_ids):
     """
     Create a bar chart of eco-friendly scores.
 
     Args:
         materials_df (pd.DataFrame): Materials database
-        selected_material_ids (list): List of selected material IDs
+        selected_material_ids (tuple): Selected material IDs
 
     Returns:
         go.Figure: Plotly figure object
@@ -202,7 +281,7 @@ def visualize_environmental_impact(materials_df, selected_material_ids):
         return None
 
     # Filter materials by selected IDs
-    selected_materials = materials_df[materials_df["id"].isin(selected_material_ids)]
+    selected_materials = select_rows(materials_df, selected_material_ids)
 
     # Sort by eco-friendly score
     selected_materials = selected_materials.sort_values(
@@ -230,13 +309,14 @@ def visualize_environmental_impact(materials_df, selected_material_ids):
     return fig
 
 
+@cache_figure
 def visualize_weather_resistance(materials_df, selected_material_ids):
     """
     Create a heatmap of weather resistance properties.
 
     Args:
         materials_df (pd.DataFrame): Materials database
-        selected_material_ids (list): List of selected material IDs
+        selected_material_ids (tuple): Selected material IDs
 
     Returns:
         go.Figure: Plotly figure object
@@ -245,22 +325,20 @@ def visualize_weather_resistance(materials_df, selected_material_ids):
         return None
 
     # Filter materials by selected IDs
-    selected_materials = materials_df[materials_df["id"].isin(selected_material_ids)]
+    selected_materials = select_rows(materials_df, selected_material_ids)
 
     # Extract weather resistance properties
-    weather_data = []
-    materials_names = []
-
-    for _, material in selected_materials.iterrows():
-        materials_names.append(material["name"])
-        weather_data.append(
-            [
-                material["weather_resistance"].get("heat", 0),
-                material["weather_resistance"].get("cold", 0),
-                material["weather_resistance"].get("humidity", 0),
-                material["weather_resistance"].get("uv", 0),
-            ]
+    materials_names = selected_materials["name"].tolist()
+    weather_data = (
+        pd.DataFrame.from_records(
+            selected_materials["weather_resistance"].tolist(),
+            columns=["heat", "cold", "humidity", "uv"],
         )
+        .fillna(0)
+        .astype(int)
+        .to_numpy()
+        .tolist()
+    )
 
     # Create heatmap
     fig = px.imshow(
@@ -325,13 +403,14 @@ def visualize_material_scores(scored_materials):
     return fig
 
 
+@cache_figure
 def visualize_supplier_comparison(suppliers_df, supplier_ids):
     """
     Create a figure comparing supplier metrics.
 
     Args:
         suppliers_df (pd.DataFrame): Suppliers database
-        supplier_ids (list): List of supplier IDs
+        supplier_ids (tuple): Supplier IDs
 
     Returns:
         go.Figure: Plotly figure object
@@ -340,7 +419,7 @@ def visualize_supplier_comparison(suppliers_df, supplier_ids):
         return None
 
     # Filter suppliers by IDs
-    selected_suppliers = suppliers_df[suppliers_df["supplier_id"].isin(supplier_ids)]
+    selected_suppliers = select_rows(suppliers_df, supplier_ids, "supplier_id")
 
     # Create subplots
     fig = make_subplots(